@@ -1,22 +1,42 @@
 from __future__ import annotations
 
 import base64
+import functools
 import io
 import json
 import math
 import os
+import queue
+import shutil
+import subprocess
 import tempfile
-from typing import Dict, List, Literal, Tuple
+import threading
+from typing import Dict, List, Literal, Optional, Tuple
 
 import numpy as np
 import cv2
+import mediapipe as mp
 from fastapi import FastAPI, File, Form, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response, StreamingResponse, FileResponse
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse, FileResponse
 from starlette.background import BackgroundTask
 
+try:  # optional: ffmpeg-backed codecs (NVDEC/NVENC when a CUDA device is present)
+    import ffmpegcv
+except ImportError:
+    ffmpegcv = None
+except RuntimeError as ex:  # ffmpegcv checks for ffmpeg/ffprobe on PATH at import
+    print(f"[startup] ffmpegcv disabled, using OpenCV codecs: {ex}")
+    ffmpegcv = None
 
-app = FastAPI(title="Pose Analysis API")
+try:  # optional: keyframe seeking for /frame/extract
+    import av
+except ImportError:
+    av = None
+
+
+app = FastAPI(title="Pose Analysis API", default_response_class=ORJSONResponse)
 
 # CORS configuration
 app.add_middleware(
@@ -30,27 +50,116 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# MediaPipe handles shared by every request
+_MP_POSE = mp.solutions.pose
+_MP_DRAW = mp.solutions.drawing_utils
+_POSE_CONNECTIONS = _MP_POSE.POSE_CONNECTIONS
+_LANDMARK_INDEX: Dict[str, int] = {lm.name.lower(): lm.value for lm in _MP_POSE.PoseLandmark}
+
+# Thick skeleton styles used by draw_pose_landmarks_thick
+_LANDMARK_SPEC = _MP_DRAW.DrawingSpec(color=(0, 255, 0), thickness=3, circle_radius=3)
+_CONNECTION_SPEC = _MP_DRAW.DrawingSpec(color=(0, 200, 255), thickness=4)
+
+# Pose graphs are loaded once at startup and reused across requests. They are
+# not thread-safe: video graphs are checked out of a pool for a whole video
+# (tracking state is per-stream), the image graph is guarded by a lock.
+_POSE_VIDEO_POOL_SIZE = 2
+_POSE_VIDEO_POOL: queue.Queue = queue.Queue()
+for _ in range(_POSE_VIDEO_POOL_SIZE):
+    _POSE_VIDEO_POOL.put(_MP_POSE.Pose(static_image_mode=False, model_complexity=1, enable_segmentation=False))
+_POSE_IMAGE = _MP_POSE.Pose(static_image_mode=True, model_complexity=1)
+_POSE_IMAGE_LOCK = threading.Lock()
+
+
+# (a, b, c, group, side): angle ABC measured at landmark B.
+_ANGLE_TRIPLES: List[Tuple[str, str, str, str, str]] = [
+    # knee: angle at knee from hip-knee-ankle
+    ("left_hip", "left_knee", "left_ankle", "knees", "left"),
+    ("right_hip", "right_knee", "right_ankle", "knees", "right"),
+    # hip: angle at hip from shoulder-hip-knee
+    ("left_shoulder", "left_hip", "left_knee", "hips", "left"),
+    ("right_shoulder", "right_hip", "right_knee", "hips", "right"),
+    # ankle: angle at ankle from knee-ankle-heel
+    ("left_knee", "left_ankle", "left_heel", "ankles", "left"),
+    ("right_knee", "right_ankle", "right_heel", "ankles", "right"),
+    # shoulder: angle at shoulder from hip-shoulder-elbow
+    ("left_hip", "left_shoulder", "left_elbow", "shoulders", "left"),
+    ("right_hip", "right_shoulder", "right_elbow", "shoulders", "right"),
+    # elbow: angle at elbow from shoulder-elbow-wrist
+    ("left_shoulder", "left_elbow", "left_wrist", "elbows", "left"),
+    ("right_shoulder", "right_elbow", "right_wrist", "elbows", "right"),
+]
+
+
+def _angles_batch(pts: np.ndarray) -> np.ndarray:
+    """Return the angles at the middle point of each (N, 3, 3) triple in degrees.
+
+    Works in the input dtype (float32 landmarks stay float32). Zero-length
+    vectors yield NaN; cosines are clamped for numerical stability.
+    """
+    ba = pts[:, 0] - pts[:, 1]
+    bc = pts[:, 2] - pts[:, 1]
+    nba = np.linalg.norm(ba, axis=1)
+    nbc = np.linalg.norm(bc, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cosang = np.einsum("ij,ij->i", ba, bc) / (nba * nbc)
+    cosang[(nba == 0) | (nbc == 0)] = np.nan
+    return np.degrees(np.arccos(np.clip(cosang, -1.0, 1.0)))
+
 
-def _angle_between(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> float:
-    """Return the angle ABC (at point B) in degrees using 3D vectors.
+def _angles_loop(pts: np.ndarray, tri: np.ndarray) -> np.ndarray:
+    """Scalar form of `_angles_batch` over landmark indices, compiled with Numba.
 
-    Handles zero-length vectors and clamps for numerical stability.
+    pts: (33, 3) float32 landmarks; tri: (N, 3) indices. Returns (N,) float32 angles in degrees.
     """
-    ba = a - b
-    bc = c - b
-    nba = np.linalg.norm(ba)
-    nbc = np.linalg.norm(bc)
-    if nba == 0 or nbc == 0:
-        return float("nan")
-    cosang = float(np.dot(ba, bc) / (nba * nbc))
-    cosang = max(-1.0, min(1.0, cosang))
-    return math.degrees(math.acos(cosang))
-
-
-def compute_joint_angles(landmarks: Dict[str, Tuple[float, float, float]]) -> Dict[str, Dict[str, float]]:
+    one = np.float32(1.0)
+    out = np.empty(tri.shape[0], dtype=np.float32)
+    for i in range(tri.shape[0]):
+        a, b, c = pts[tri[i, 0]], pts[tri[i, 1]], pts[tri[i, 2]]
+        dot = np.float32(0.0)
+        nba = np.float32(0.0)
+        nbc = np.float32(0.0)
+        for k in range(3):
+            ba = a[k] - b[k]
+            bc = c[k] - b[k]
+            dot += ba * bc
+            nba += ba * ba
+            nbc += bc * bc
+        # Also catches NaN coordinates, which min/max below would otherwise clamp away
+        if not (nba > 0 and nbc > 0):
+            out[i] = np.nan
+            continue
+        cosang = min(one, max(-one, dot / np.sqrt(nba * nbc)))
+        out[i] = np.degrees(np.arccos(cosang))
+    return out
+
+
+@functools.lru_cache(maxsize=1)
+def _angle_kernel():
+    """Return the per-frame angle kernel, JIT-compiling it on first use when Numba is installed."""
+    try:
+        import numba
+    except ImportError:
+        return lambda pts, tri: _angles_batch(pts[tri])
+    # fastmath without the no-NaN/no-Inf flags, so missing landmarks still give NaN
+    return numba.njit(cache=True, fastmath={"nsz", "arcp", "contract", "afn", "reassoc"})(_angles_loop)
+
+
+_NUM_POSE_LANDMARKS = len(_LANDMARK_INDEX)
+
+
+# Built once at import so the per-frame path never touches landmark names
+_TRIPLE_INDEX = np.array(
+    [[_LANDMARK_INDEX[a], _LANDMARK_INDEX[b], _LANDMARK_INDEX[c]] for a, b, c, _, _ in _ANGLE_TRIPLES],
+    dtype=np.int32,
+)
+_TRIPLE_META: List[Tuple[str, str]] = [(group, side) for _, _, _, group, side in _ANGLE_TRIPLES]
+
+
+def compute_joint_angles(landmarks: np.ndarray) -> Dict[str, Dict[str, float]]:
     """Compute angles for knees, hips, ankles, shoulders, elbows for left/right.
 
-    landmarks: dict mapping landmark name to (x, y, z) in normalized coordinates.
+    landmarks: (33, 3) array of (x, y, z) in normalized coordinates, indexed by PoseLandmark.
     Returns a dict: {
       "knees": {"left": deg, "right": deg},
       "hips": {"left": deg, "right": deg},
@@ -59,37 +168,12 @@ def compute_joint_angles(landmarks: Dict[str, Tuple[float, float, float]]) -> Di
       "elbows": {"left": deg, "right": deg}
     }
     """
-    def v(name: str) -> np.ndarray:
-        return np.array(landmarks.get(name, (np.nan, np.nan, np.nan)), dtype=float)
-
-    # Angles:
-    # knee: angle at knee from hip-knee-ankle
-    left_knee = _angle_between(v("left_hip"), v("left_knee"), v("left_ankle"))
-    right_knee = _angle_between(v("right_hip"), v("right_knee"), v("right_ankle"))
-
-    # hip: angle at hip from shoulder-hip-knee
-    left_hip = _angle_between(v("left_shoulder"), v("left_hip"), v("left_knee"))
-    right_hip = _angle_between(v("right_shoulder"), v("right_hip"), v("right_knee"))
-
-    # ankle: angle at ankle from knee-ankle-heel (or foot_index if heel missing)
-    left_ankle = _angle_between(v("left_knee"), v("left_ankle"), v("left_heel"))
-    right_ankle = _angle_between(v("right_knee"), v("right_ankle"), v("right_heel"))
+    degs = _angle_kernel()(landmarks, _TRIPLE_INDEX)
 
-    # shoulder: angle at shoulder from hip-shoulder-elbow
-    left_shoulder = _angle_between(v("left_hip"), v("left_shoulder"), v("left_elbow"))
-    right_shoulder = _angle_between(v("right_hip"), v("right_shoulder"), v("right_elbow"))
-
-    # elbow: angle at elbow from shoulder-elbow-wrist
-    left_elbow = _angle_between(v("left_shoulder"), v("left_elbow"), v("left_wrist"))
-    right_elbow = _angle_between(v("right_shoulder"), v("right_elbow"), v("right_wrist"))
-
-    return {
-        "knees": {"left": left_knee, "right": right_knee},
-        "hips": {"left": left_hip, "right": right_hip},
-        "ankles": {"left": left_ankle, "right": right_ankle},
-        "shoulders": {"left": left_shoulder, "right": right_shoulder},
-        "elbows": {"left": left_elbow, "right": right_elbow},
-    }
+    out: Dict[str, Dict[str, float]] = {}
+    for (group, side), deg in zip(_TRIPLE_META, degs):
+        out.setdefault(group, {})[side] = deg
+    return out
 
 
 def draw_pose_landmarks_thick(image: np.ndarray, results) -> np.ndarray:
@@ -97,46 +181,44 @@ def draw_pose_landmarks_thick(image: np.ndarray, results) -> np.ndarray:
 
     Uses circles for keypoints and thicker lines for connections. Skips face mesh.
     """
-    import mediapipe as mp
-
-    mp_drawing = mp.solutions.drawing_utils
-    mp_drawing_styles = mp.solutions.drawing_styles
-    mp_pose = mp.solutions.pose
-
     if not results.pose_landmarks:
         return image
 
-    # Base styles with heavier thickness
-    landmark_drawing_spec = mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=3, circle_radius=3)
-    connection_drawing_spec = mp_drawing.DrawingSpec(color=(0, 200, 255), thickness=4)
-
-    mp_drawing.draw_landmarks(
+    _MP_DRAW.draw_landmarks(
         image,
         results.pose_landmarks,
-        mp_pose.POSE_CONNECTIONS,
-        landmark_drawing_spec,
-        connection_drawing_spec,
+        _POSE_CONNECTIONS,
+        _LANDMARK_SPEC,
+        _CONNECTION_SPEC,
     )
     return image
 
 
-def _landmarks_to_dict(results) -> Dict[str, Tuple[float, float, float]]:
-    import mediapipe as mp
-
-    mp_pose = mp.solutions.pose
+def _landmarks_to_array(results) -> np.ndarray:
+    """Return pose landmarks as a (33, 3) float32 array of (x, y, z)."""
     if not results.pose_landmarks:
-        return {}
-    lms = results.pose_landmarks.landmark
-    name_map = {lm.name.lower(): lm.value for lm in mp_pose.PoseLandmark}
-    # name_map maps e.g. 'left_shoulder' -> index
-    out: Dict[str, Tuple[float, float, float]] = {}
-    for name, idx in name_map.items():
-        pt = lms[idx]
-        out[name] = (pt.x, pt.y, pt.z)
-    return out
+        return np.full((_NUM_POSE_LANDMARKS, 3), np.nan, dtype=np.float32)
+    return np.fromiter(
+        (c for lm in results.pose_landmarks.landmark for c in (lm.x, lm.y, lm.z)),
+        dtype=np.float32,
+        count=_NUM_POSE_LANDMARKS * 3,
+    ).reshape(_NUM_POSE_LANDMARKS, 3)
+
+
+_UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Image uploads are decoded from memory, so their size is capped
+_MAX_IMAGE_UPLOAD_BYTES = 20 * 1024 * 1024
+
+ImageFormat = Literal["png", "jpg"]
 
+# Response image encodings: fast PNG (zlib level 1) or JPEG at quality 85
+_IMAGE_ENCODINGS: Dict[str, Tuple[str, List[int], str]] = {
+    "png": (".png", [cv2.IMWRITE_PNG_COMPRESSION, 1], "image/png"),
+    "jpg": (".jpg", [cv2.IMWRITE_JPEG_QUALITY, 85], "image/jpeg"),
+}
 
-def _iter_file_chunks(path: str, chunk_size: int = 1024 * 1024):
+
+def _iter_file_chunks(path: str, chunk_size: int = _UPLOAD_CHUNK_SIZE):
     with open(path, "rb") as f:
         while True:
             chunk = f.read(chunk_size)
@@ -145,6 +227,237 @@ def _iter_file_chunks(path: str, chunk_size: int = 1024 * 1024):
             yield chunk
 
 
+def _persist_upload(file: UploadFile, suffix: str) -> Tuple[str, int]:
+    """Copy an upload into a closed temp file in chunks; return (path, size in bytes)."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_in:
+        shutil.copyfileobj(file.file, tmp_in, length=_UPLOAD_CHUNK_SIZE)
+        tmp_in.flush()
+        return tmp_in.name, os.fstat(tmp_in.fileno()).st_size
+
+
+@functools.lru_cache(maxsize=1)
+def _nvidia_gpu_available() -> bool:
+    """Return whether `nvidia-smi` lists at least one GPU."""
+    try:
+        proc = subprocess.run(["nvidia-smi", "-L"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return proc.returncode == 0 and "GPU " in proc.stdout
+
+
+@functools.lru_cache(maxsize=None)
+def _ffmpeg_has_codec(kind: Literal["encoder", "decoder"], name: str) -> bool:
+    """Return whether the ffmpeg on PATH was built with encoder/decoder `name`."""
+    try:
+        proc = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-h", f"{kind}={name}"],
+            capture_output=True, text=True, timeout=10,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return f"{kind.capitalize()} {name} " in proc.stdout
+
+
+def _ffmpeg_has_encoder(name: str) -> bool:
+    # ffmpegcv writers only start ffmpeg on the first write(), so a missing
+    # encoder has to be detected up front to fall back to OpenCV in time.
+    return _ffmpeg_has_codec("encoder", name)
+
+
+def _ffmpeg_has_decoder(name: str) -> bool:
+    return _ffmpeg_has_codec("decoder", name)
+
+
+def _open_cv_capture(input_path: str) -> cv2.VideoCapture:
+    """Open a file with OpenCV's FFmpeg backend and a single-frame buffer."""
+    cap = cv2.VideoCapture(input_path, cv2.CAP_FFMPEG)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+class _NVVideoCapture:
+    """Adapter giving `ffmpegcv.VideoCaptureNV` the subset of the cv2.VideoCapture API we use.
+
+    Frames are decoded on the GPU (NVDEC) and returned as RGB, not BGR.
+    """
+
+    def __init__(self, path: str):
+        self._cap = ffmpegcv.VideoCaptureNV(path, pix_fmt="rgb24")
+        self._frame = None
+
+    def isOpened(self) -> bool:
+        return True
+
+    def get(self, prop: int) -> float:
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self._cap.fps)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self._cap.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self._cap.height)
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self._cap.count)
+        return 0.0
+
+    def grab(self) -> bool:
+        # The ffmpeg pipe always decodes, so grab() keeps the frame for retrieve()
+        ok, self._frame = self._cap.read()
+        return ok
+
+    def retrieve(self):
+        return self._frame is not None, self._frame
+
+    def read(self):
+        ok = self.grab()
+        return self.retrieve() if ok else (False, None)
+
+    def release(self) -> None:
+        self._cap.release()
+
+
+def _open_video_capture(input_path: str):
+    """Open a capture for decoding, using NVDEC via ffmpegcv when an NVIDIA GPU and cuvid are present."""
+    if ffmpegcv is not None and _nvidia_gpu_available() and _ffmpeg_has_decoder("h264_cuvid"):
+        try:
+            return _NVVideoCapture(input_path)
+        except Exception as ex:
+            print(f"[analyze_video] ffmpegcv decoder unavailable, using OpenCV: {ex}")
+    return _open_cv_capture(input_path)
+
+
+def _open_video_writer(output_path: str, fps: float, width: int, height: int):
+    """Open an H.264 writer, preferring ffmpegcv (NVENC, then x264) over OpenCV.
+
+    All returned writers share the `.write(frame)` / `.release()` API.
+    """
+    # ffmpegcv encodes to yuv420p, which needs even dimensions; OpenCV copes with odd ones
+    if ffmpegcv is not None and width % 2 == 0 and height % 2 == 0:
+        try:
+            if _nvidia_gpu_available() and _ffmpeg_has_encoder("h264_nvenc"):
+                return ffmpegcv.VideoWriterNV(output_path, "h264", fps)
+            if _ffmpeg_has_encoder("libx264"):
+                return ffmpegcv.VideoWriter(output_path, "libx264", fps)
+            print("[analyze_video] ffmpeg has no H.264 encoder, using OpenCV")
+        except Exception as ex:
+            print(f"[analyze_video] ffmpegcv writer unavailable, using OpenCV: {ex}")
+
+    # Use mp4v; fallback to XVID on Windows if needed
+    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+    writer = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    if not writer or not writer.isOpened():
+        # try XVID fallback (common on Windows)
+        fourcc = cv2.VideoWriter_fourcc(*"XVID")
+        writer = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    if not writer or not writer.isOpened():
+        raise RuntimeError("Failed to initialize VideoWriter for output MP4")
+    return writer
+
+
+# Longest side of the frames fed to Pose. Landmarks are normalized, so they
+# still map onto the full-resolution frame for drawing.
+_INFERENCE_MAX_SIDE = 480
+
+
+def _inference_size(width: int, height: int) -> Tuple[int, int]:
+    """Return (w, h) scaled down to fit `_INFERENCE_MAX_SIDE`, keeping aspect ratio."""
+    scale = min(1.0, _INFERENCE_MAX_SIDE / max(width, height, 1))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _put_frame(frames_q: queue.Queue, item, stop: threading.Event) -> bool:
+    """Put onto a bounded queue, giving up once the consumer has set `stop`."""
+    while not stop.is_set():
+        try:
+            frames_q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _decode_frames(
+    cap,
+    frames_q: queue.Queue,
+    stop: threading.Event,
+    sample_every: int,
+    need_bgr: bool,
+    frames_are_rgb: bool,
+    shape: Tuple[int, int, int],
+    errors: List[Exception],
+) -> None:
+    """Reader thread for analyze_video: push one (bgr, rgb) item per frame, then None.
+
+    Frames that are neither sampled nor written are only grabbed and pushed as
+    (None, None), which keeps the consumer's frame count exact. `bgr` is the
+    full-size frame, or None unless `need_bgr`; `rgb` is the frame downscaled
+    to the inference size (`shape`). RGB conversions go into a small ring of
+    buffers sized so a buffer is never overwritten while the consumer may still
+    hold it.
+    """
+    # Queued frames, plus one being produced and one being consumed
+    rgb_bufs = [] if frames_are_rgb else [np.empty(shape, dtype=np.uint8) for _ in range(frames_q.maxsize + 2)]
+    resize_buf = None
+    slot = 0
+    index = 0
+    try:
+        while not stop.is_set():
+            # grab() only advances the demuxer; frames that are neither
+            # written nor sampled are never decoded to BGR.
+            if not cap.grab():
+                break
+            if not (need_bgr or index % sample_every == 0):
+                item = (None, None)
+            else:
+                ok, frame = cap.retrieve()
+                if not ok:
+                    break
+                h, w = frame.shape[:2]
+                inference_size = _inference_size(w, h)
+                if frames_are_rgb:
+                    rgb = frame
+                    if inference_size != (w, h):
+                        rgb = cv2.resize(frame, inference_size, interpolation=cv2.INTER_AREA)
+                    frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR) if need_bgr else None
+                else:
+                    small = frame
+                    if inference_size != (w, h):
+                        small = resize_buf = cv2.resize(
+                            frame, inference_size, dst=resize_buf, interpolation=cv2.INTER_AREA
+                        )
+                    rgb = rgb_bufs[slot]
+                    if small.shape != rgb.shape:
+                        rgb = rgb_bufs[slot] = np.empty(small.shape, dtype=np.uint8)
+                    cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=rgb)
+                    slot = (slot + 1) % len(rgb_bufs)
+                    if not need_bgr:
+                        frame = None
+                item = (frame, rgb)
+            if not _put_frame(frames_q, item, stop):
+                return
+            index += 1
+    except Exception as ex:
+        errors.append(ex)
+    finally:
+        _put_frame(frames_q, None, stop)
+
+
+def _write_frames(writer, write_q: queue.Queue, errors: List[Exception]) -> None:
+    """Writer thread for analyze_video: write queued frames until None.
+
+    After a failure it keeps draining the queue so the producer never blocks.
+    """
+    while True:
+        frame = write_q.get()
+        if frame is None:
+            break
+        if errors:
+            continue
+        try:
+            writer.write(frame)
+        except Exception as ex:
+            errors.append(ex)
+
+
 def _cleanup_temp(path: str):
     try:
         if os.path.exists(path):
@@ -154,7 +467,7 @@ def _cleanup_temp(path: str):
 
 
 @app.post("/analyze/video")
-def analyze_video(
+async def analyze_video(
     file: UploadFile = File(...),
     return_mode: Literal["video", "json", "both"] = Query("video"),
     role: Literal["tutorial", "user"] = Query("user"),
@@ -162,23 +475,36 @@ def analyze_video(
     """Analyze a video with MediaPipe Pose and return JSON/video.
 
     Hardened for Windows + OpenCV: use closed NamedTemporaryFile, robust error handling, and clear console logs.
+    Upload copying and frame processing run in the threadpool so the event loop stays free;
+    up to _POSE_VIDEO_POOL_SIZE videos are processed concurrently, further ones wait for a graph.
     """
-    import mediapipe as mp
     import traceback
 
     # 1) Persist upload to a closed temp file (.mp4) before OpenCV touches it
     try:
-        suffix = ".mp4"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_in:
-            raw = file.file.read()
-            tmp_in.write(raw)
-            input_path = tmp_in.name
-        print(f"[analyze_video] Received file: {file.filename}; temp: {input_path}; bytes: {len(raw)}")
+        input_path, size = await run_in_threadpool(_persist_upload, file, ".mp4")
+        print(f"[analyze_video] Received file: {file.filename}; temp: {input_path}; bytes: {size}")
     except Exception:
         print("[analyze_video] Failed to persist upload:")
         traceback.print_exc()
-        return JSONResponse(status_code=400, content={"detail": "Failed to persist uploaded file"})
+        return ORJSONResponse(status_code=400, content={"detail": "Failed to persist uploaded file"})
+
+    return await run_in_threadpool(_analyze_video_file, input_path, return_mode, role)
+
 
+def _analyze_video_file(input_path: str, return_mode: str, role: str):
+    # Check out a graph before opening the capture, output file or threads, so
+    # requests waiting on the pool hold nothing else.
+    pose = _POSE_VIDEO_POOL.get()
+    try:
+        # Drop tracking ROI and landmark smoothing left over from the previous video
+        pose.reset()
+        return _analyze_video_with(pose, input_path, return_mode, role)
+    finally:
+        _POSE_VIDEO_POOL.put(pose)
+
+
+def _analyze_video_with(pose, input_path: str, return_mode: str, role: str):
     cap = None
     writer = None
     output_path = None
@@ -187,9 +513,11 @@ def analyze_video(
     total_processed = 0
 
     try:
-        cap = cv2.VideoCapture(input_path)
+        cap = _open_video_capture(input_path)
         if not cap.isOpened():
             raise RuntimeError("OpenCV could not open the uploaded video")
+        # NVDEC frames arrive as RGB already; OpenCV frames are BGR
+        frames_are_rgb = isinstance(cap, _NVVideoCapture)
 
         fps = cap.get(cv2.CAP_PROP_FPS)
         if not fps or fps <= 0 or math.isnan(fps):
@@ -201,40 +529,67 @@ def analyze_video(
         # 3) Prepare VideoWriter for 'video' or 'both'
         need_video = return_mode in ("video", "both")
         if need_video:
-            # Use mp4v; fallback to XVID on Windows if needed
-            fourcc = cv2.VideoWriter_fourcc(*"mp4v")
             tmp_out = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
             output_path = tmp_out.name
             tmp_out.close()
-            writer = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-            if not writer or not writer.isOpened():
-                # try XVID fallback (common on Windows)
-                fourcc = cv2.VideoWriter_fourcc(*"XVID")
-                writer = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-            if not writer or not writer.isOpened():
-                raise RuntimeError("Failed to initialize VideoWriter for output MP4")
-
-        mp_pose = mp.solutions.pose
+            writer = _open_video_writer(output_path, fps, width, height)
+
         sample_every = 5  # Sample every N frames for JSON
-        with mp_pose.Pose(static_image_mode=False, model_complexity=1, enable_segmentation=False) as pose:
+        max_samples = 50
+        inference_w, inference_h = _inference_size(width, height)
+        # Decode on a background thread so it overlaps with pose inference
+        frames_q: queue.Queue = queue.Queue(maxsize=4)
+        stop = threading.Event()
+        reader_errors: List[Exception] = []
+        reader = threading.Thread(
+            target=_decode_frames,
+            args=(cap, frames_q, stop, sample_every, need_video, frames_are_rgb, (inference_h, inference_w, 3), reader_errors),
+            daemon=True,
+        )
+        reader.start()
+        # Encode on a background thread too, so decode | infer | write overlap
+        write_q: queue.Queue = queue.Queue(maxsize=8)
+        writer_errors: List[Exception] = []
+        writer_thread = None
+        if need_video:
+            writer_thread = threading.Thread(
+                target=_write_frames, args=(writer, write_q, writer_errors), daemon=True
+            )
+            writer_thread.start()
+        try:
             while True:
-                ok, frame = cap.read()
-                if not ok:
+                # A failed write already dooms the request; don't keep running Pose
+                if writer_errors:
+                    break
+                item = frames_q.get()
+                if item is None:
                     break
-                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                results = pose.process(rgb)
+                frame, rgb = item
+                if rgb is not None:
+                    results = pose.process(rgb)
 
-                annotated = draw_pose_landmarks_thick(frame, results)
-                if need_video:
-                    writer.write(annotated)
+                    if need_video:
+                        annotated = draw_pose_landmarks_thick(frame, results)
+                        write_q.put(annotated)
 
-                if results.pose_landmarks and (frame_index % sample_every == 0) and len(sample_angles) < 50:
-                    lmk = _landmarks_to_dict(results)
-                    angles = compute_joint_angles(lmk)
-                    sample_angles.append({"frame": frame_index, "angles": angles})
+                    if results.pose_landmarks and frame_index % sample_every == 0 and len(sample_angles) < max_samples:
+                        lmk = _landmarks_to_array(results)
+                        angles = compute_joint_angles(lmk)
+                        sample_angles.append({"frame": frame_index, "angles": angles})
 
                 frame_index += 1
                 total_processed += 1
+                # Without an output video there is nothing left to do once the quota is met
+                if not need_video and len(sample_angles) >= max_samples:
+                    break
+        finally:
+            stop.set()
+            reader.join()
+            if writer_thread is not None:
+                write_q.put(None)
+                writer_thread.join()
+        if reader_errors or writer_errors:
+            raise (reader_errors + writer_errors)[0]
 
         print(f"[analyze_video] total frames processed: {total_processed}")
 
@@ -256,7 +611,7 @@ def analyze_video(
         _cleanup_temp(input_path)
         if output_path:
             _cleanup_temp(output_path)
-        return JSONResponse(status_code=400, content={"detail": str(ex)})
+        return ORJSONResponse(status_code=400, content={"detail": str(ex)})
 
     # Normal cleanup and return based on mode
     if cap is not None:
@@ -268,7 +623,7 @@ def analyze_video(
     if return_mode == "json":
         if output_path:
             _cleanup_temp(output_path)
-        return JSONResponse({
+        return ORJSONResponse({
             "role": role,
             "samples": sample_angles,
             "total_frames": total_processed,
@@ -279,7 +634,7 @@ def analyze_video(
     else:  # both
         # Provide relative path to help the frontend show a link if desired
         rel_path = os.path.relpath(output_path)
-        return JSONResponse({
+        return ORJSONResponse({
             "role": role,
             "video_path": rel_path,
             "samples": sample_angles,
@@ -287,71 +642,184 @@ def analyze_video(
         })
 
 
+async def _read_image_upload(file: UploadFile) -> Optional[bytes]:
+    """Read an image upload into memory, or return None if it exceeds `_MAX_IMAGE_UPLOAD_BYTES`."""
+    if file.size is not None and file.size > _MAX_IMAGE_UPLOAD_BYTES:
+        return None
+    data = await file.read(_MAX_IMAGE_UPLOAD_BYTES + 1)
+    if len(data) > _MAX_IMAGE_UPLOAD_BYTES:
+        return None
+    return data
+
+
+def _image_too_large() -> ORJSONResponse:
+    return ORJSONResponse(status_code=413, content={"error": "Image too large"})
+
+
+def _decode_image(data: bytes) -> Optional[np.ndarray]:
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def _process_image(img: np.ndarray):
+    rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    with _POSE_IMAGE_LOCK:
+        return _POSE_IMAGE.process(rgb)
+
+
+def _image_angles(results) -> Dict[str, Dict[str, float]]:
+    if not results.pose_landmarks:
+        return {}
+    return compute_joint_angles(_landmarks_to_array(results))
+
+
 @app.post("/analyze/image")
-def analyze_image(file: UploadFile = File(...)):
-    import mediapipe as mp
+async def analyze_image(
+    file: UploadFile = File(...),
+    image_format: ImageFormat = Query("png", alias="format"),
+):
+    """Annotated image (base64) and angles in one JSON body.
 
-    data = np.frombuffer(file.file.read(), dtype=np.uint8)
-    img = cv2.imdecode(data, cv2.IMREAD_COLOR)
-    if img is None:
-        return JSONResponse(status_code=400, content={"error": "Invalid image"})
+    Prefer /analyze/image/annotated and /analyze/image/angles, which skip the base64 round trip.
+    """
+    data = await _read_image_upload(file)
+    if data is None:
+        return _image_too_large()
+    return await run_in_threadpool(_analyze_image_bytes, data, image_format)
 
-    mp_pose = mp.solutions.pose
-    with mp_pose.Pose(static_image_mode=True, model_complexity=1) as pose:
-        rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        results = pose.process(rgb)
-        annotated = img.copy()
-        annotated = draw_pose_landmarks_thick(annotated, results)
 
-        angles = {}
-        if results.pose_landmarks:
-            lmk = _landmarks_to_dict(results)
-            angles = compute_joint_angles(lmk)
+def _analyze_image_bytes(data: bytes, image_format: str):
+    img = _decode_image(data)
+    if img is None:
+        return ORJSONResponse(status_code=400, content={"error": "Invalid image"})
+
+    results = _process_image(img)
+    annotated = img.copy()
+    annotated = draw_pose_landmarks_thick(annotated, results)
+    angles = _image_angles(results)
 
-    ok, buf = cv2.imencode(".png", annotated)
+    ext, params, _ = _IMAGE_ENCODINGS[image_format]
+    ok, buf = cv2.imencode(ext, annotated, params)
     if not ok:
-        return JSONResponse(status_code=500, content={"error": "Encoding failed"})
-    b64_png = base64.b64encode(buf.tobytes()).decode("ascii")
-    return JSONResponse({
-        "png_base64": b64_png,
+        return ORJSONResponse(status_code=500, content={"error": "Encoding failed"})
+    b64_img = base64.b64encode(buf.tobytes()).decode("ascii")
+    return ORJSONResponse({
+        f"{image_format}_base64": b64_img,
         "angles": angles,
     })
 
 
+@app.post("/analyze/image/annotated")
+async def analyze_image_annotated(
+    file: UploadFile = File(...),
+    image_format: ImageFormat = Query("png", alias="format"),
+):
+    """Return the annotated image as raw bytes."""
+    data = await _read_image_upload(file)
+    if data is None:
+        return _image_too_large()
+    return await run_in_threadpool(_annotate_image_bytes, data, image_format)
+
+
+def _annotate_image_bytes(data: bytes, image_format: str):
+    img = _decode_image(data)
+    if img is None:
+        return ORJSONResponse(status_code=400, content={"error": "Invalid image"})
+
+    results = _process_image(img)
+    annotated = draw_pose_landmarks_thick(img, results)
+
+    ext, params, media_type = _IMAGE_ENCODINGS[image_format]
+    ok, buf = cv2.imencode(ext, annotated, params)
+    if not ok:
+        return ORJSONResponse(status_code=500, content={"error": "Encoding failed"})
+    return Response(content=buf.tobytes(), media_type=media_type)
+
+
+@app.post("/analyze/image/angles")
+async def analyze_image_angles(file: UploadFile = File(...)):
+    """Return only the joint angles for an image."""
+    data = await _read_image_upload(file)
+    if data is None:
+        return _image_too_large()
+    return await run_in_threadpool(_image_angles_bytes, data)
+
+
+def _image_angles_bytes(data: bytes):
+    img = _decode_image(data)
+    if img is None:
+        return ORJSONResponse(status_code=400, content={"error": "Invalid image"})
+    return ORJSONResponse({"angles": _image_angles(_process_image(img))})
+
+
 @app.post("/frame/extract")
-def extract_frame(
+async def extract_frame(
     file: UploadFile = File(...),
     timestamp: float = Query(..., description="Timestamp in seconds"),
+    image_format: ImageFormat = Query("png", alias="format"),
 ):
     # Save upload to temp
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename or "")[1] or ".mp4") as tmp_in:
-        tmp_in.write(file.file.read())
-        input_path = tmp_in.name
+    suffix = os.path.splitext(file.filename or "")[1] or ".mp4"
+    input_path, _ = await run_in_threadpool(_persist_upload, file, suffix)
+    return await run_in_threadpool(_extract_frame_file, input_path, timestamp, image_format)
 
-    cap = cv2.VideoCapture(input_path)
-    if not cap.isOpened():
-        _cleanup_temp(input_path)
-        return JSONResponse(status_code=400, content={"error": "Could not read video"})
-
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    if not fps or fps <= 0 or math.isnan(fps):
-        fps = 30.0
-    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
-    target_index = int(round(max(0.0, timestamp) * fps))
-    target_index = max(0, min(frame_count - 1, target_index)) if frame_count > 0 else target_index
-
-    cap.set(cv2.CAP_PROP_POS_FRAMES, target_index)
-    ok, frame = cap.read()
-    cap.release()
+
+def _read_frame_av(input_path: str, timestamp: float) -> Optional[np.ndarray]:
+    """Decode the frame closest to `timestamp` with PyAV.
+
+    Seeks to the keyframe at or before the target, then decodes forward only
+    until the target, instead of decoding from the start of the file. Past the
+    end of the video, the last frame is returned.
+    """
+    with av.open(input_path) as container:
+        stream = container.streams.video[0]
+        fps = float(stream.average_rate or 30.0)
+        target_pts = (stream.start_time or 0) + int(max(0.0, timestamp) / stream.time_base)
+        # First frame whose timestamp is within half a frame of the target
+        min_pts = target_pts - int(0.5 / (fps * stream.time_base))
+        container.seek(target_pts, any_frame=False, backward=True, stream=stream)
+        frame = None
+        for frame in container.decode(stream):
+            if frame.pts is not None and frame.pts >= min_pts:
+                break
+        return None if frame is None else frame.to_ndarray(format="bgr24")
+
+
+def _extract_frame_file(input_path: str, timestamp: float, image_format: str):
+    frame = None
+    if av is not None:
+        try:
+            frame = _read_frame_av(input_path, timestamp)
+        except Exception as ex:
+            print(f"[extract_frame] PyAV seek failed, using OpenCV: {ex}")
+
+    if frame is None:
+        cap = _open_cv_capture(input_path)
+        if not cap.isOpened():
+            _cleanup_temp(input_path)
+            return ORJSONResponse(status_code=400, content={"error": "Could not read video"})
+
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if not fps or fps <= 0 or math.isnan(fps):
+            fps = 30.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        target_index = int(round(max(0.0, timestamp) * fps))
+        target_index = max(0, min(frame_count - 1, target_index)) if frame_count > 0 else target_index
+
+        cap.set(cv2.CAP_PROP_POS_FRAMES, target_index)
+        ok, frame = cap.read()
+        cap.release()
+        if not ok:
+            frame = None
     _cleanup_temp(input_path)
 
-    if not ok or frame is None:
-        return JSONResponse(status_code=404, content={"error": "Frame not found"})
+    if frame is None:
+        return ORJSONResponse(status_code=404, content={"error": "Frame not found"})
 
-    ok, buf = cv2.imencode(".png", frame)
+    ext, params, media_type = _IMAGE_ENCODINGS[image_format]
+    ok, buf = cv2.imencode(ext, frame, params)
     if not ok:
-        return JSONResponse(status_code=500, content={"error": "Encoding failed"})
-    return Response(content=buf.tobytes(), media_type="image/png")
+        return ORJSONResponse(status_code=500, content={"error": "Encoding failed"})
+    return Response(content=buf.tobytes(), media_type=media_type)
 
 
 # Root for quick health check